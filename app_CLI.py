@@ -1,17 +1,22 @@
 # app_cli.py
-import os, re, math, random, datetime as dt
+import os, json, math, time, atexit, random, asyncio, threading, datetime as dt
 from dataclasses import dataclass, field
 from typing import Dict, List, Tuple, Optional
 
+from re_compat import compile_pattern
+
 # --- Optional OpenAI explanations ---
 from dotenv import load_dotenv
 load_dotenv()
 USE_OAI = os.getenv("USE_OPENAI_EXPLANATIONS", "true").lower() == "true"
+USE_OAI_BATCH = os.getenv("USE_OPENAI_BATCH", "false").lower() == "true"
 oai = None
+aoai = None
 if USE_OAI:
     try:
-        from openai import OpenAI
+        from openai import OpenAI, AsyncOpenAI
         oai = OpenAI()
+        aoai = AsyncOpenAI()
     except Exception:
         USE_OAI = False  # fall back to built-in explanations
 
@@ -43,6 +48,13 @@ GEN_BY_TRACK = {
     "lsat": gen_lsat,
 }
 
+# Questions are generated once per track at startup; seeding a user's day just
+# samples from the pool.
+QPOOL_SIZE = 1024
+QPOOL: Dict[str, List[Tuple[str, str]]] = {
+    track: [gen() for _ in range(QPOOL_SIZE)] for track, gen in GEN_BY_TRACK.items()
+}
+
 # ---------------------------
 # User model
 # ---------------------------
@@ -51,58 +63,332 @@ class User:
     name: str
     track: str = "consulting"
     per_day: int = 3
-    queue: List[Tuple[str, str]] = field(default_factory=list)  # list of (q, a)
+    questions: List[str] = field(default_factory=list)  # today's questions...
+    answers: List[str] = field(default_factory=list)    # ...and their answers, index-aligned
     open_idx: Optional[int] = None
     correct: int = 0
     total: int = 0
 
     def seed_today(self):
-        self.queue.clear()
-        for _ in range(self.per_day):
-            q, a = GEN_BY_TRACK[self.track]()
-            self.queue.append((q, a))
+        picked = random.sample(QPOOL[self.track], self.per_day)
+        self.questions = [q for q, _ in picked]
+        self.answers = [a for _, a in picked]
         self.open_idx = None
 
 # ---------------------------
 # Grading and explanations
 # ---------------------------
+_NUM_RE = compile_pattern(r"-?\d+(?:\.\d+)?")
+_DIGITS_RE = compile_pattern(r"\d+")
+
 def grade(user_text: str, correct: str) -> Tuple[str, Optional[str]]:
     t = user_text.strip().upper()
     if t == "HINT":
         return "hint", None
     # numeric grading
-    if re.fullmatch(r"-?\d+(\.\d+)?", correct or ""):
-        nums = re.findall(r"-?\d+(\.\d+)?", t)
-        if not nums:
+    if _NUM_RE.fullmatch(correct or ""):
+        m = _NUM_RE.search(t)
+        if not m:
             return "unknown", None
-        ok = abs(float(nums[0]) - float(correct)) < 1e-6
-        return ("correct" if ok else "incorrect", nums[0])
+        num = m.group(0)
+        ok = abs(float(num) - float(correct)) < 1e-6
+        return ("correct" if ok else "incorrect", num)
     # multiple choice grading
     if correct in "ABCDE" and t in "ABCDE":
         return ("correct" if t == correct else "incorrect", t)
     return "unknown", None
 
-def explain_with_oai(question: str, answer: str) -> str:
-    if not USE_OAI or oai is None:
-        return ""
-    prompt = (
-        "Explain the answer in at most 2 concise lines. Plain text only.\n"
+# Wrong answers get the built-in explanation right away; the OpenAI one is
+# fetched in the background and sent as a follow-up. With USE_OPENAI_BATCH the
+# requests are instead held and sent as one Batch API job (cheaper, slower).
+OAI_EXPLAIN_MODEL = "gpt-4.1-mini"
+MAX_CONCURRENT_EXPLANATIONS = 10
+EXPLANATIONS_PER_MINUTE = int(os.getenv("OPENAI_EXPLANATIONS_PER_MINUTE", "60"))
+EXPLAIN_RETRIES = 3
+EXPLAIN_DEBOUNCE_SECONDS = 0.5
+MAX_EXPLAIN_BATCH = 20
+
+EXPLANATIONS_FILE = os.getenv("EXPLANATIONS_FILE", "explanations.json")
+# Submitted-but-uncollected batch ids, so a batch still running at exit is
+# collected on a later flush or at the next startup instead of being lost.
+EXPLANATION_BATCHES_FILE = os.getenv("EXPLANATION_BATCHES_FILE", "explanation_batches.json")
+
+pending_explanations: List[Tuple[User, str, str]] = []  # (user, q, a) awaiting a batch
+explanations_cache: Dict[Tuple[str, str], str] = {}       # _explain_key(q, a) -> explanation
+_explanations_lock = threading.Lock()  # the explainer thread writes while atexit saves
+# batch id -> its items in custom_id order; user is None for batches loaded from disk
+submitted_batches: Dict[str, List[Tuple[Optional[User], str, str]]] = {}
+
+def _explain_key(question: str, answer: str) -> Tuple[str, str]:
+    """Collapse numeric variants of a template onto one cache entry."""
+    template = _DIGITS_RE.sub("N", question)
+    bucket = "N" if _NUM_RE.fullmatch(answer) else answer
+    return template, bucket
+
+def _explain_prompt(question: str, answer: str) -> str:
+    # Explanations are shared across a template's numeric variants, so ask for
+    # the method rather than a walk-through of these particular numbers.
+    return (
+        "Explain how to solve this kind of question in at most 2 concise lines. "
+        "Describe the method; don't restate the specific numbers. Plain text only.\n"
         f"Question: {question}\nCorrect answer: {answer}\n"
     )
+
+def load_explanations():
     try:
-        resp = oai.responses.create(model="gpt-4.1-mini", input=prompt)
-        return (resp.output_text or "").strip()
-    except Exception:
+        with open(EXPLANATIONS_FILE, encoding="utf-8") as f:
+            rows = json.load(f)
+    except (OSError, ValueError):
+        return
+    for row in rows:
+        explanations_cache[(row["q"], row["a"])] = row["text"]
+
+def save_explanations():
+    if not explanations_cache:
+        return
+    with _explanations_lock:
+        rows = [{"q": q, "a": a, "text": text} for (q, a), text in explanations_cache.items()]
+    data = json.dumps(rows, ensure_ascii=False, indent=2)  # one write() instead of one per token
+    with open(EXPLANATIONS_FILE, "w", encoding="utf-8") as f:
+        f.write(data)
+
+def load_batches():
+    try:
+        with open(EXPLANATION_BATCHES_FILE, encoding="utf-8") as f:
+            rows = json.load(f)
+    except (OSError, ValueError):
+        return
+    for row in rows:
+        submitted_batches[row["id"]] = [(None, q, a) for q, a in row["items"]]
+
+def save_batches():
+    rows = [{"id": bid, "items": [[q, a] for _, q, a in items]}
+            for bid, items in submitted_batches.items()]
+    if not rows:
+        try:
+            os.remove(EXPLANATION_BATCHES_FILE)
+        except OSError:
+            pass
+        return
+    with open(EXPLANATION_BATCHES_FILE, "w", encoding="utf-8") as f:
+        f.write(json.dumps(rows, ensure_ascii=False))
+
+def explain_with_oai(user: User, question: str, answer: str) -> str:
+    """Return a cached OpenAI explanation, or queue one for the next flush."""
+    if not USE_OAI or oai is None:
         return ""
+    cached = explanations_cache.get(_explain_key(question, answer))
+    if cached:
+        return cached
+    if USE_OAI_BATCH:
+        pending_explanations.append((user, question, answer))
+    elif _explain_loop is not None:
+        _explain_loop.call_soon_threadsafe(_explain_queue.put_nowait, (user, question, answer))
+    return ""
+
+# ---------------------------
+# Background explainer (asyncio, bounded concurrency)
+# ---------------------------
+_explain_loop: Optional[asyncio.AbstractEventLoop] = None
+_explain_queue: Optional[asyncio.Queue] = None
+
+class _TokenBucket:
+    """Simple requests-per-minute limiter shared by all explanation calls."""
+    def __init__(self, per_minute: int):
+        self.capacity = max(1, per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    async def take(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+def _explain_batch_prompt(pairs: List[Tuple[str, str]]) -> str:
+    lines = [
+        "For each numbered question below, explain how to solve that kind of question "
+        "in at most 2 concise lines. Describe the method; don't restate the specific numbers.",
+        'Return JSON only: {"explanations": [string, ...]} with one entry per question, in order.',
+        "",
+    ]
+    for i, (q, a) in enumerate(pairs, 1):
+        lines.append(f"Q{i}: {q}")
+        lines.append(f"A{i}: {a}")
+    return "\n".join(lines)
+
+async def _explain_async(pairs: List[Tuple[str, str]], bucket: _TokenBucket) -> List[str]:
+    """One OpenAI call for all pairs; returns explanations in the same order ([] on failure)."""
+    for attempt in range(EXPLAIN_RETRIES + 1):
+        await bucket.take()
+        try:
+            resp = await aoai.responses.create(
+                model=OAI_EXPLAIN_MODEL,
+                input=_explain_batch_prompt(pairs),
+                text={"format": {"type": "json_object"}},
+            )
+            break
+        except Exception as e:
+            status = getattr(e, "status_code", None)
+            retryable = status is None or status == 429 or status >= 500
+            if not retryable or attempt == EXPLAIN_RETRIES:
+                return []
+            await asyncio.sleep(2 ** attempt)
+    else:
+        return []
+    # Parse outside the retry loop: a malformed reply would come back the same way.
+    try:
+        texts = json.loads(resp.output_text or "{}").get("explanations") or []
+    except (ValueError, AttributeError):
+        return []
+    if not isinstance(texts, list) or len(texts) != len(pairs):
+        return []
+    return [str(t).strip() for t in texts]
+
+async def _explain_worker():
+    sem = asyncio.Semaphore(MAX_CONCURRENT_EXPLANATIONS)
+    bucket = _TokenBucket(EXPLANATIONS_PER_MINUTE)
+    tasks = set()
+
+    async def run(batch: List[Tuple[User, str, str]]):
+        # Ask once per distinct template, then fan the answers back out.
+        unique: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        for _, q, a in batch:
+            unique.setdefault(_explain_key(q, a), (q, a))
+        async with sem:
+            texts = await _explain_async(list(unique.values()), bucket)
+        results = dict(zip(unique.keys(), texts))
+        for user, q, a in batch:
+            text = results.get(_explain_key(q, a))
+            if text:
+                with _explanations_lock:
+                    explanations_cache[_explain_key(q, a)] = text
+                send_message(user, f"More on \"{q}\": {text}")
+
+    while True:
+        # Coalesce wrong answers that arrive close together into one request.
+        batch = [await _explain_queue.get()]
+        await asyncio.sleep(EXPLAIN_DEBOUNCE_SECONDS)
+        while not _explain_queue.empty() and len(batch) < MAX_EXPLAIN_BATCH:
+            batch.append(_explain_queue.get_nowait())
+        task = asyncio.create_task(run(batch))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+def start_explainer():
+    """Run the explanation worker on its own event loop in a daemon thread."""
+    global _explain_loop
+    if aoai is None or USE_OAI_BATCH or _explain_loop is not None:
+        return
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run():
+        global _explain_queue
+        asyncio.set_event_loop(loop)
+        _explain_queue = asyncio.Queue()
+        loop.create_task(_explain_worker())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="explainer", daemon=True).start()
+    ready.wait()
+    _explain_loop = loop
+
+def _response_text(body: dict) -> str:
+    """Pull the output text out of a raw /v1/responses body."""
+    parts = []
+    for item in body.get("output") or []:
+        for c in item.get("content") or []:
+            if c.get("type") == "output_text":
+                parts.append(c.get("text") or "")
+    return "".join(parts).strip()
+
+def collect_batches():
+    """Check each submitted batch once; cache and deliver the ones that finished."""
+    if oai is None:
+        return
+    for bid, items in list(submitted_batches.items()):
+        try:
+            batch = oai.batches.retrieve(bid)
+            if batch.status in ("validating", "in_progress", "finalizing"):
+                continue  # still running; look again on the next flush
+            output = ""
+            if batch.status == "completed" and batch.output_file_id:
+                output = oai.files.content(batch.output_file_id).text
+        except Exception as e:
+            print(f"Explanation batch {bid}: check failed ({e}); will retry.")
+            continue  # transient; keep the id and retry later
+        del submitted_batches[bid]
+        if batch.status != "completed":  # failed, expired or cancelled
+            print(f"Explanation batch {bid} ended {batch.status}; dropping {len(items)} request(s).")
+        for line in output.splitlines():
+            try:
+                row = json.loads(line)
+                user, q, a = items[int(row["custom_id"])]
+                text = _response_text(row["response"]["body"])
+            except Exception:
+                continue
+            if text:
+                explanations_cache[_explain_key(q, a)] = text
+                if user is not None:
+                    send_message(user, f"More on \"{q}\": {text}")
+    save_batches()
+
+def flush_explanations():
+    """
+    Collect any finished batches, then submit queued explanations as one Batch
+    API job. Never waits on a batch: results arrive on a later flush.
+    """
+    if oai is None:
+        return
+    collect_batches()
+    if not pending_explanations:
+        return
+    items = list(pending_explanations)
+
+    lines = []
+    for idx, (_, q, a) in enumerate(items):
+        lines.append(json.dumps({
+            "custom_id": str(idx),
+            "method": "POST",
+            "url": "/v1/responses",
+            "body": {"model": OAI_EXPLAIN_MODEL, "input": _explain_prompt(q, a)},
+        }))
+    try:
+        upload = oai.files.create(
+            file=("explanations.jsonl", ("\n".join(lines) + "\n").encode("utf-8")),
+            purpose="batch",
+        )
+        batch = oai.batches.create(
+            input_file_id=upload.id,
+            endpoint="/v1/responses",
+            completion_window="24h",
+        )
+    except Exception as e:
+        # keep the queue; the next flush submits it again
+        print(f"Explanation batch submit failed ({e}); keeping {len(items)} request(s) queued.")
+        return
+    submitted_batches[batch.id] = items
+    save_batches()
+    del pending_explanations[:len(items)]  # only once the batch id is on disk
+
+_TAG_RE = compile_pattern(r"^\[([^\]]+)\]")
+EXPLAINERS = {
+    "Consulting": lambda a: f"Breakeven = Fixed / (Price − Var). Here: {a} units.",
+    "IB": lambda a: f"EPS = Net income / Shares. Here: {a}.",
+    "LSAT": lambda a: "This is a hasty generalization from limited observations.",
+}
 
 def builtin_explanation(q: str, a: str) -> str:
-    if q.startswith("[Consulting]"):
-        return f"Breakeven = Fixed / (Price − Var). Here: {a} units."
-    if q.startswith("[IB]"):
-        return f"EPS = Net income / Shares. Here: {a}."
-    if q.startswith("[LSAT]"):
-        return "This is a hasty generalization from limited observations."
-    return f"Answer: {a}"
+    m = _TAG_RE.match(q)
+    explainer = EXPLAINERS.get(m.group(1)) if m else None
+    return explainer(a) if explainer else f"Answer: {a}"
 
 # ---------------------------
 # CLI “transport” (simulate SMS)
@@ -118,18 +404,18 @@ def receive_message(prompt: str = "> ") -> str:
         return ""
 
 def send_next_question(user: User) -> bool:
-    for idx, (q, a) in enumerate(user.queue):
-        if user.open_idx is None or idx > user.open_idx:
-            user.open_idx = idx
-            send_message(user, q + "\nReply with a number or A–E. (HINT for a nudge)")
-            return True
-    return False
+    nxt = 0 if user.open_idx is None else user.open_idx + 1
+    if nxt >= len(user.questions):
+        return False
+    user.open_idx = nxt
+    send_message(user, user.questions[nxt] + "\nReply with a number or A–E. (HINT for a nudge)")
+    return True
 
 def handle_reply(user: User, text: str):
     if user.open_idx is None:
         send_message(user, "No open question. Type NEXT to get one.")
         return
-    q, a = user.queue[user.open_idx]
+    q, a = user.questions[user.open_idx], user.answers[user.open_idx]
     status, _ = grade(text, a)
     if status == "hint":
         send_message(user, "Hint: identify the one formula/step needed; keep it to one move.")
@@ -143,7 +429,11 @@ def handle_reply(user: User, text: str):
         user.correct += 1
         send_message(user, "Correct.")
     else:
-        exp = explain_with_oai(q, a) or builtin_explanation(q, a)
+        # the cached text only explains the method, so always lead with the answer itself
+        exp = builtin_explanation(q, a)
+        method = explain_with_oai(user, q, a)
+        if method:
+            exp = f"{exp} {method}"
         send_message(user, f"Not quite. {exp}")
 
 def summary(user: User):
@@ -161,6 +451,11 @@ def main():
     }
     for u in users.values():
         u.seed_today()
+    load_explanations()
+    atexit.register(save_explanations)
+    load_batches()
+    collect_batches()  # results of batches still running when we last exited
+    start_explainer()
 
     current = users["andrew"]
 
@@ -215,10 +510,13 @@ def main():
         elif cmd == "STATS":
             summary(current)
         elif cmd == "SEED":
+            flush_explanations()
             current.seed_today()
             print("New questions seeded for today.")
         else:
             print("Unknown command. Type HELP.")
 
+    flush_explanations()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,19 @@
+# clock.py — runs the minute tick in its own process (Procfile: clock)
+import os
+import sys
+import time
+import signal
+
+os.environ.setdefault("RUN_SCHEDULER", "1")
+
+import server  # noqa: E402 — starts the BackgroundScheduler and SMS workers at import
+
+if __name__ == "__main__":
+    # The platform stops us with SIGTERM; turn it into a normal exit so the
+    # scheduler stops cleanly and server's atexit drain flushes queued SMS.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            time.sleep(3600)
+    finally:
+        server.scheduler.shutdown(wait=True)  # let a running tick finish queueing its sends
@@ -1,13 +1,29 @@
 # db.py
 import os
 from datetime import datetime
-from sqlalchemy import create_engine, Column, String, Integer, Boolean, DateTime
+from sqlalchemy import create_engine, event, inspect, text, Column, String, Integer, Boolean, DateTime
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.types import JSON  # falls back to JSON on SQLite
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.exc import OperationalError
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///local.db")
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+_pool_kwargs = {} if DATABASE_URL.startswith("sqlite") else {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+}
+engine = create_engine(DATABASE_URL, pool_pre_ping=True, **_pool_kwargs)
+
+if DATABASE_URL.startswith("sqlite"):
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        # WAL lets readers run alongside the writer; NORMAL skips the fsync per commit.
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.close()
+
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
 Base = declarative_base()
 
@@ -23,22 +39,50 @@ class User(Base):
     subscribed = Column(Boolean, default=True)
     open = Column(JsonType)       # payload for current open question
     stats = Column(JsonType)      # {"asked":..,"correct":..,"streak":..}
-    schedule = Column(JsonType)   # {"local_date":..,"remaining_utc":[...]}
+    schedule = Column(JsonType)   # {"local_date":..,"remaining_utc":[epoch seconds, ...]}
+    next_due_utc = Column(DateTime, index=True)  # next slot, or local midnight to rebuild; naive UTC
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+# pg_advisory_lock key for schema setup (any constant shared by all processes)
+_DDL_LOCK_KEY = 7_402_117_001
+
 def init_db():
+    if engine.dialect.name != "postgresql":
+        _create_schema()
+        return
+    # Every web worker and the clock boot at once, and concurrent CREATEs can
+    # still collide on pg_class even with IF NOT EXISTS; take turns instead.
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _DDL_LOCK_KEY})
+        conn.commit()
+        try:
+            _create_schema()
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _DDL_LOCK_KEY})
+            conn.commit()
+
+def _create_schema():
     Base.metadata.create_all(engine)
+    _add_missing_columns()
 
-def get_or_create(phone, defaults):
-    with SessionLocal() as s:
-        u = s.get(User, phone)
-        if not u:
-            u = User(phone=phone, **defaults)
-            s.add(u); s.commit()
-        return u
-
-def save(user):
-    with SessionLocal() as s:
-        s.merge(user); s.commit()
-        return user
+def _add_missing_columns():
+    """
+    create_all() never alters an existing table, so add newer columns here.
+    Every web worker and the clock run this at import, so another process may add
+    the column between our check and the ALTER; that must not fail the boot.
+    """
+    cols = {c["name"] for c in inspect(engine).get_columns("users")}
+    if "next_due_utc" not in cols:
+        if engine.dialect.name == "postgresql":
+            with engine.begin() as conn:
+                conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS next_due_utc TIMESTAMP"))
+        else:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text("ALTER TABLE users ADD COLUMN next_due_utc TIMESTAMP"))
+            except OperationalError as e:
+                if "duplicate column" not in str(e).lower():
+                    raise
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_next_due_utc ON users (next_due_utc)"))
@@ -0,0 +1,7 @@
+# re_compat.py — one place to compile the regexes server.py and app_CLI.py match user text with
+import re2  # google-re2 (requirements.txt): DFA matching, linear time on hostile input
+
+
+def compile_pattern(pattern: str):
+    """Compile with RE2; its \\d and \\D are ASCII-only, like re with re.ASCII."""
+    return re2.compile(pattern)
@@ -1,6 +1,9 @@
 # server.py — Flask + Twilio webhook + APScheduler (DB-backed)
-import os, re, json, html, random
-from datetime import datetime, timedelta
+import os, gzip, json, time, atexit, hashlib, queue, random, threading
+from types import SimpleNamespace
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
 from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
@@ -11,10 +14,19 @@ from openai import OpenAI
 
 
 from apscheduler.schedulers.background import BackgroundScheduler
-import pytz
+from zoneinfo import ZoneInfo, available_timezones
 
 from twilio.rest import Client
-from twilio.twiml.messaging_response import MessagingResponse
+from twilio.http.http_client import TwilioHttpClient
+from requests.adapters import HTTPAdapter
+from xml.sax.saxutils import escape as _xml_escape
+from flask.json.provider import JSONProvider
+import orjson  # requirements.txt; a broken install should fail at boot, not fall back quietly
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
 
 # Track / question logic
 from tracks import (
@@ -26,6 +38,9 @@ from tracks import (
 )
 # DB layer
 from db import init_db, SessionLocal, User
+from re_compat import compile_pattern
+from sqlalchemy import or_, select, update as sa_update  # `update` is the /update view
+from sqlalchemy.orm.attributes import flag_modified
 
 # -----------------------------
 # App & static hosting
@@ -36,21 +51,67 @@ load_dotenv()
 app = Flask(__name__, static_url_path="", static_folder="static")
 CORS(app)
 
+class OrjsonProvider(JSONProvider):
+    """orjson-backed JSON for jsonify() and request.get_json()."""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype="application/json")
+
+app.json = OrjsonProvider(app)
+
+# Pages are read and compressed once at startup; requests never touch disk.
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "3600"))
+_STATIC_PAGES = ("home.html", "signup.html", "preferences.html", "how.html")
+
+def _precompress(name: str) -> dict:
+    """encoding -> (body, etag); each representation gets its own strong ETag."""
+    with open(os.path.join(app.static_folder, name), "rb") as f:
+        raw = f.read()
+    encoded = {"identity": raw, "gzip": gzip.compress(raw, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(raw, quality=11)
+    digest = hashlib.sha1(raw).hexdigest()
+    return {enc: (body, f"{digest}-{enc}") for enc, body in encoded.items()}
+
+_COMPRESSED = {name: _precompress(name) for name in _STATIC_PAGES}
+
+def _static_page(name: str):
+    accept = request.accept_encodings
+    for enc in ("br", "gzip"):
+        entry = _COMPRESSED[name].get(enc)
+        if entry is not None and accept[enc]:
+            resp = Response(entry[0], mimetype="text/html")
+            resp.headers["Content-Encoding"] = enc
+            break
+    else:
+        entry = _COMPRESSED[name]["identity"]
+        resp = Response(entry[0], mimetype="text/html")
+    resp.set_etag(entry[1])
+    resp.headers["Vary"] = "Accept-Encoding"
+    resp.headers["Cache-Control"] = f"public, max-age={STATIC_MAX_AGE}"
+    return resp.make_conditional(request)  # 304 on a matching If-None-Match
+
 @app.get("/")
 def home_page():
-    return app.send_static_file("home.html")
+    return _static_page("home.html")
 
 @app.get("/join")
 def join_page():
-    return app.send_static_file("signup.html")
+    return _static_page("signup.html")
 
 @app.get("/preferences")
 def preferences_page():
-    return app.send_static_file("preferences.html")
+    return _static_page("preferences.html")
 
 @app.get("/how")
 def how_page():
-    return app.send_static_file("how.html")
+    return _static_page("how.html")
 
 # -----------------------------
 # Config
@@ -62,58 +123,204 @@ WINDOW_END_HOUR   = int(os.getenv("WINDOW_END_HOUR", "22"))    # 22:00 local
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID", "").strip()
 TWILIO_AUTH_TOKEN  = os.getenv("TWILIO_AUTH_TOKEN", "").strip()
 TWILIO_FROM        = os.getenv("TWILIO_FROM", "").strip()
+TWILIO_NOTIFY_SERVICE_SID = os.getenv("TWILIO_NOTIFY_SERVICE_SID", "").strip()  # optional, for bulk sends
 
 # init DB
 init_db()
 
-_twilio = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN) if (TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN) else None
+TWILIO_HTTP_TIMEOUT = float(os.getenv("TWILIO_HTTP_TIMEOUT", "10"))
+
+def _twilio_http_client() -> TwilioHttpClient:
+    """One keep-alive session for all Twilio calls, sized for concurrent senders."""
+    http = TwilioHttpClient(pool_connections=True, timeout=TWILIO_HTTP_TIMEOUT)
+    http.session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=50))
+    return http
+
+_twilio = (
+    Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, http_client=_twilio_http_client())
+    if (TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN) else None
+)
+_notify = _twilio.notify.v1.services(TWILIO_NOTIFY_SERVICE_SID) if (_twilio and TWILIO_NOTIFY_SERVICE_SID) else None
 
 # ---------- OpenAI config ----------
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 USE_OPENAI_QUESTIONS = os.getenv("USE_OPENAI_QUESTIONS", "1") == "1"
-_openai_client = OpenAI() if os.getenv("OPENAI_API_KEY") else None
+# Questions are composed outside row locks, but a slow call still delays the reply
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "10"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "1"))
+_openai_client = (
+    OpenAI(timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES)
+    if os.getenv("OPENAI_API_KEY") else None
+)
 
 
-def send_sms(to: str, body: str):
+def _send_sms_now(to: str, body: str):
     """Send an SMS via Twilio (no-op if creds missing)."""
     if not (_twilio and TWILIO_FROM and to and body):
         return
     _twilio.messages.create(from_=TWILIO_FROM, to=to, body=body)
 
+NOTIFY_MAX_BINDINGS = 10000  # Twilio Notify limit per notification
+
+def _send_bulk_now(phones: tuple, body: str):
+    """Send one body to several numbers with a single Twilio Notify call."""
+    if not (_notify and phones and body):
+        return
+    _notify.notifications.create(
+        body=body,
+        to_binding=[json.dumps({"binding_type": "sms", "address": p}) for p in phones],
+    )
+
+# All outbound SMS go through a bounded queue drained by a pool of background
+# threads, so request handlers and the scheduler never wait on Twilio and a
+# burst of due sends goes out in parallel.
+SMS_SEND_RETRIES = 3
+SMS_WORKERS = int(os.getenv("SMS_WORKERS", "16"))
+SMS_QUEUE_MAX = int(os.getenv("SMS_QUEUE_MAX", "1000"))
+SMS_ENQUEUE_TIMEOUT = float(os.getenv("SMS_ENQUEUE_TIMEOUT", "30"))  # wait for room, background callers
+SMS_DRAIN_SECONDS = float(os.getenv("SMS_DRAIN_SECONDS", "10"))      # flush on shutdown
+_sms_queue = queue.Queue(maxsize=SMS_QUEUE_MAX)
+
+def _recipients(to) -> str:
+    """Log label for a send; a Notify bulk tuple can hold thousands of numbers."""
+    return f"{len(to)} recipients ({to[0]}…)" if isinstance(to, tuple) else to
+
+def _sms_worker():
+    while True:
+        to, body = _sms_queue.get()  # `to` is a tuple of numbers for a Notify bulk send
+        send = _send_bulk_now if isinstance(to, tuple) else _send_sms_now
+        for attempt in range(SMS_SEND_RETRIES + 1):
+            try:
+                send(to, body)
+                break
+            except Exception as e:
+                status = getattr(e, "status", None)  # TwilioRestException carries the HTTP status
+                retryable = status is None or status == 429 or status >= 500
+                if not retryable or attempt == SMS_SEND_RETRIES:
+                    app.logger.exception("SMS to %s failed after %d attempt(s)", _recipients(to), attempt + 1)
+                    break
+                time.sleep(2 ** attempt)
+        _sms_queue.task_done()
+
+for _i in range(max(1, SMS_WORKERS)):
+    threading.Thread(target=_sms_worker, name=f"sms-worker-{_i}", daemon=True).start()
+
+def _drain_sms_queue():
+    """Give queued messages a bounded chance to go out before the process exits."""
+    deadline = time.monotonic() + SMS_DRAIN_SECONDS
+    while _sms_queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.1)
+    if _sms_queue.unfinished_tasks:
+        app.logger.error("Exiting with %d SMS still queued", _sms_queue.unfinished_tasks)
+
+atexit.register(_drain_sms_queue)
+
+def send_sms(to: str, body: str, timeout: Optional[float] = None) -> bool:
+    """
+    Queue an SMS for the background sender. With no timeout (request handlers)
+    this never blocks; background callers pass a timeout to wait for room.
+    Returns False if the message was dropped because the queue stayed full.
+    """
+    try:
+        if timeout is None:
+            _sms_queue.put_nowait((to, body))
+        else:
+            _sms_queue.put((to, body), timeout=timeout)
+    except queue.Full:
+        app.logger.error("SMS queue full (%d); dropping message to %s", SMS_QUEUE_MAX, _recipients(to))
+        return False
+    return True
+
+def send_sms_many(phones, body: str, timeout: Optional[float] = None) -> list:
+    """
+    Queue one body for several numbers. With TWILIO_NOTIFY_SERVICE_SID set this
+    is one Notify call per NOTIFY_MAX_BINDINGS numbers; otherwise one SMS each.
+    Returns the numbers that could not be queued.
+    """
+    phones = list(phones)
+    if _notify is None or len(phones) < 2:
+        return [p for p in phones if not send_sms(p, body, timeout)]
+    dropped = []
+    for i in range(0, len(phones), NOTIFY_MAX_BINDINGS):
+        chunk = tuple(phones[i:i + NOTIFY_MAX_BINDINGS])
+        if not send_sms(chunk, body, timeout):
+            dropped.extend(chunk)
+    return dropped
+
 # -----------------------------
 # Helpers (general)
 # -----------------------------
+_NONDIGIT_RE = compile_pattern(r"\D")
+_NON_ALPHA_UP_RE = compile_pattern(r"[^A-Z]")
+
+# Deletes every Latin-1 non-digit; input with wider characters takes the regex path.
+_KEEP_DIGITS = str.maketrans("", "", "".join(chr(c) for c in range(256) if not "0" <= chr(c) <= "9"))
+# Formatting people type after a leading "+", e.g. "+1 (508) 555-1234"
+_PHONE_PUNCT = str.maketrans("", "", " \t-.()")
+
 def _normalize_phone(phone: str) -> str:
     s = (phone or "").strip()
     if not s:
         return ""
     if s.startswith("+"):
-        return s
-    digits = re.sub(r"\D", "", s)
+        return "+" + s[1:].translate(_PHONE_PUNCT)
+    digits = s.translate(_KEEP_DIGITS)
+    if not digits.isascii():
+        digits = _NONDIGIT_RE.sub("", s)
     if len(digits) == 10:
         return "+1" + digits
     if len(digits) == 11 and digits.startswith("1"):
         return "+" + digits
     return s
 
-def _list_tracks():
-    return list(QUESTIONS.keys())
+def _valid_e164(phone: str) -> bool:
+    """Match +[1-9]\\d{7,14} with str methods; isascii() keeps non-ASCII digits out."""
+    return (
+        bool(phone) and phone.isascii() and phone[0] == "+"
+        and 8 <= len(phone) - 1 <= 15 and phone[1:].isdigit() and phone[1] != "0"
+    )
+
+@lru_cache(maxsize=1)
+def _list_tracks() -> tuple:
+    return tuple(QUESTIONS.keys())
+
+# track name -> the bank's own key, so accepted input is never kept around
+ALLOWED_TRACKS = {t: t for t in QUESTIONS}
+_TRACKS_STR = ", ".join(_list_tracks())
+
+def _valid_track(name) -> Optional[str]:
+    """Return the bank's track name, or None if it isn't one we serve."""
+    return ALLOWED_TRACKS.get(str(name).strip())
 
 def _user_tzname(user) -> str:
     return (user.timezone or DEFAULT_TZ).strip() or DEFAULT_TZ
 
+# ZoneInfo keys are case-sensitive; pytz wasn't, so stored and typed names may be lowercase.
+_TZ_CANON = {z.lower(): z for z in available_timezones()}
+
+def _canonical_tz(name) -> Optional[str]:
+    """The IANA spelling of a zone name in any case, or None if it isn't one."""
+    return _TZ_CANON.get(str(name).strip().lower())
+
+@lru_cache(maxsize=512)
+def _tz(name: str):
+    """ZoneInfo() keeps its own cache, but memoizing here also skips key validation."""
+    return ZoneInfo(_canonical_tz(name) or name)
+
 def _user_tz(user):
     tzname = _user_tzname(user)
     try:
-        return pytz.timezone(tzname)
+        return _tz(tzname)
     except Exception:
-        return pytz.timezone(DEFAULT_TZ)
+        return _tz(DEFAULT_TZ)
 
 def _today_local_date_str(tz):
     return datetime.now(tz).strftime("%Y-%m-%d")
 
+UTC = timezone.utc
+
 def _now_utc_minute():
-    return datetime.utcnow().replace(second=0, microsecond=0, tzinfo=pytz.UTC)
+    return datetime.now(UTC).replace(second=0, microsecond=0)
 
 def _serialize_user(u: User) -> dict:
     return {
@@ -133,13 +340,20 @@ def _serialize_user(u: User) -> dict:
 # -----------------------------
 # DB helpers
 # -----------------------------
-def _get_user(session, phone: str) -> Optional[User]:
-    return session.get(User, phone)
+def _get_user(session, phone: str, lock: bool = False) -> Optional[User]:
+    """lock=True takes a row lock (SELECT ... FOR UPDATE) held until the request commits."""
+    return session.get(User, phone, with_for_update=lock)
 
-def _ensure_user(session, phone: str) -> User:
+def _stored_track(phone: str) -> Optional[str]:
+    """A user's track, read in its own short session so no lock or transaction stays open."""
+    with SessionLocal() as session:
+        return session.scalar(select(User.track).where(User.phone == phone))
+
+def _ensure_user(session, phone: str, now: Optional[datetime] = None, lock: bool = False) -> User:
     phone = _normalize_phone(phone)
-    u = _get_user(session, phone)
+    u = _get_user(session, phone, lock)
     if u is None:
+        now = now or datetime.utcnow()
         u = User(
             phone=phone,
             name="",
@@ -149,18 +363,45 @@ def _ensure_user(session, phone: str) -> User:
             subscribed=True,
             open=None,
             stats={"asked": 0, "correct": 0, "streak": 0},
-            schedule={"local_date": None, "remaining_utc": []},
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow(),
+            schedule={"local_date": None, "remaining_utc": []},  # slots are UTC epoch seconds
+            created_at=now,
+            updated_at=now,
         )
         session.add(u)
         session.commit()
     return u
 
-def _save(session, user: User):
-    user.updated_at = datetime.utcnow()
+def _save(session, user: User, now: Optional[datetime] = None):
+    user.updated_at = now or datetime.utcnow()
     session.add(user)
+    phone = user.phone
     session.commit()
+    _me_cache.pop(phone, None)
+
+# /me bodies per phone as (monotonic ts, JSON bytes). Per-process, so the TTL
+# bounds staleness from writes made by other workers or the clock.
+ME_CACHE_TTL = float(os.getenv("ME_CACHE_TTL", "5"))
+ME_CACHE_MAX = int(os.getenv("ME_CACHE_MAX", "1024"))
+_me_cache = OrderedDict()  # LRU order, oldest first
+
+def _me_cache_get(phone: str) -> Optional[bytes]:
+    hit = _me_cache.get(phone)
+    if hit is None:
+        return None
+    if time.monotonic() - hit[0] >= ME_CACHE_TTL:
+        _me_cache.pop(phone, None)  # expired: drop it rather than keep it until replaced
+        return None
+    try:
+        _me_cache.move_to_end(phone)
+    except KeyError:  # invalidated by a concurrent save
+        pass
+    return hit[1]
+
+def _me_cache_put(phone: str, body: bytes):
+    _me_cache[phone] = (time.monotonic(), body)
+    _me_cache.move_to_end(phone)
+    while len(_me_cache) > ME_CACHE_MAX:
+        _me_cache.popitem(last=False)
 
 # -----------------------------
 # Building/sending questions
@@ -249,6 +490,24 @@ def _gen_ai_mcq(track: str):
         return None
 
 
+def _render_mcq(q_text: str, choices) -> str:
+    """SMS text for a bank question (A–E labelled)."""
+    labels = "ABCDE"
+    lines = [q_text]
+    for i, choice in enumerate(choices):
+        if i >= len(labels):
+            break
+        lines.append(f"{labels[i]}. {choice}")
+    if choices:
+        lines.append("Reply with A–E.")
+    return "\n".join(lines)
+
+# Every bank question rendered once at import: track -> ((qid, sms_text), ...)
+_RENDERED = {
+    track: tuple((q.get("id"), _render_mcq(q["q"], q.get("choices") or ())) for q in qs)
+    for track, qs in QUESTIONS.items()
+}
+
 def _compose_question_text(track: str):
     """
     Prefer an AI-generated MCQ for the track. Fall back to sample or math on failure.
@@ -261,20 +520,11 @@ def _compose_question_text(track: str):
 
     # B) Sample MCQ fallback (random)
     try:
-        qs = QUESTIONS.get(track) or []
-        if qs:
-            import random as _rnd
-            q = _rnd.choice(qs)
-            labels = "ABCDE"
-            lines = [q["q"]]
-            for i, choice in enumerate(q.get("choices") or []):
-                if i >= len(labels):
-                    break
-                lines.append(f"{labels[i]}. {choice}")
-            if q.get("choices"):
-                lines.append("Reply with A–E.")
-            payload = {"kind": "sample", "track": track, "qid": q.get("id")}
-            return "\n".join(lines), payload
+        rendered = _RENDERED.get(track)
+        if rendered:
+            qid, text = random.choice(rendered)
+            payload = {"kind": "sample", "track": track, "qid": qid}
+            return text, payload
     except Exception:
         pass
 
@@ -302,6 +552,7 @@ def _grade_open(session, user: User, raw_text: str):
     """
     Grade the user's reply against the currently open question.
     Supports: 'ai_mcq', 'sample', and 'math'.
+    Updates user.stats/open in place; the caller commits.
     """
     open_q = user.open or {}
     if not open_q:
@@ -309,7 +560,9 @@ def _grade_open(session, user: User, raw_text: str):
 
     ans_raw = (raw_text or "").strip()
     ans_up  = ans_raw.upper()
-    stats = dict(user.stats or {"asked": 0, "correct": 0, "streak": 0})
+    if user.stats is None:
+        user.stats = {"asked": 0, "correct": 0, "streak": 0}
+    stats = user.stats  # mutated in place; flag_modified marks it dirty
 
     def _map_to_choice(choices, up: str, raw: str):
         """Map A–E / 1–5 / full-text (case-insensitive) to a choice string."""
@@ -339,9 +592,8 @@ def _grade_open(session, user: User, raw_text: str):
         else:
             stats["streak"]  = 0
 
-        user.stats = stats
+        flag_modified(user, "stats")
         user.open  = None
-        _save(session, user)
 
         parts = []
         if correct:
@@ -361,19 +613,12 @@ def _grade_open(session, user: User, raw_text: str):
     if open_q.get("kind") == "sample":
         track = open_q.get("track") or user.track or "Consulting"
         qid   = str(open_q.get("qid"))
-        qs = QUESTIONS.get(track) or []
-        q  = next((qq for qq in qs if str(qq.get("id")) == qid), None)
-        if not q:
+        res = grade_answer(track, qid, ans_raw)  # indexed lookup + A–E / 1–5 / text matching
+        if "error" in res:
             return {"body": "Sorry—I couldn't find that question. Reply NEXT for a new one."}
-        choices = q.get("choices") or []
-        correct_text = q.get("answer")
-        user_choice = _map_to_choice(choices, ans_up, ans_raw)
-        correct = (str(user_choice).strip().upper() == str(correct_text).strip().upper())
-        try:
-            idx = choices.index(correct_text)
-            corr_letter = "ABCDE"[idx]
-        except Exception:
-            corr_letter = None
+        correct = res["correct"]
+        correct_text = res["correct_answer"]
+        corr_letter = res["correct_letter"]
 
         stats["asked"] = stats.get("asked", 0) + 1
         if correct:
@@ -381,9 +626,8 @@ def _grade_open(session, user: User, raw_text: str):
             stats["streak"]  = stats.get("streak", 0) + 1
         else:
             stats["streak"]  = 0
-        user.stats = stats
+        flag_modified(user, "stats")
         user.open  = None
-        _save(session, user)
 
         parts = []
         if correct:
@@ -393,10 +637,10 @@ def _grade_open(session, user: User, raw_text: str):
                 parts.append(f"Not quite. Correct answer: {corr_letter}. {correct_text}")
             else:
                 parts.append(f"Not quite. Correct answer: {correct_text}")
-        if q.get("rationale"):
-            parts.append(f"Why: {q['rationale']}")
-        if q.get("tip"):
-            parts.append(f"Tip: {q['tip']}")
+        if res.get("rationale"):
+            parts.append(f"Why: {res['rationale']}")
+        if res.get("tip"):
+            parts.append(f"Tip: {res['tip']}")
         parts.append("Reply NEXT for another question.")
         return {"body": "\n".join(parts)}
 
@@ -414,9 +658,8 @@ def _grade_open(session, user: User, raw_text: str):
             stats["streak"]  = stats.get("streak", 0) + 1
         else:
             stats["streak"]  = 0
-        user.stats = stats
+        flag_modified(user, "stats")
         user.open  = None
-        _save(session, user)
 
         expected = res.get("expected")
         units    = res.get("units") or ""
@@ -447,58 +690,127 @@ def _rand_local_minutes(n: int, tz):
     if span <= 0:
         # degenerate window; just pick top of hour(s)
         return [today]
-    chosen = set()
-    while len(chosen) < n:
-        offset = random.randint(0, span)
-        when = today + timedelta(minutes=offset)
-        when = when.replace(second=0, microsecond=0)
-        chosen.add(when)
-    return sorted(list(chosen))
+    offsets = random.sample(range(span + 1), min(n, span + 1))
+    return sorted(today + timedelta(minutes=o) for o in offsets)
 
 def _ensure_todays_schedule(user: User):
     tz = _user_tz(user)
     today_local = _today_local_date_str(tz)
-    sched = dict(user.schedule or {})
-    if sched.get("local_date") != today_local:
+    if (user.schedule or {}).get("local_date") != today_local:
         per_day = max(1, min(3, int(user.per_day or 1)))
         local_slots = _rand_local_minutes(per_day, tz)
-        remaining_utc = [slot.astimezone(pytz.UTC).isoformat() for slot in local_slots]
+        remaining_utc = [int(slot.timestamp()) for slot in local_slots]
         user.schedule = {"local_date": today_local, "remaining_utc": remaining_utc}
+    user.next_due_utc = _next_due_utc(user)
+
+def _slot_ts(slot) -> int:
+    """Epoch seconds for a schedule slot; rows written before the switch hold ISO strings."""
+    return slot if isinstance(slot, int) else int(datetime.fromisoformat(slot).timestamp())
 
-def _pop_due_utc(user: User):
-    sched = dict(user.schedule or {"remaining_utc": []})
-    remaining = list(sched.get("remaining_utc", []))
+def _next_due_utc(user: User) -> datetime:
+    """
+    When the tick next has work for this user (naive UTC): the earliest pending
+    slot, or else local midnight, when tomorrow's schedule gets built.
+    """
+    remaining = (user.schedule or {}).get("remaining_utc") or []
+    if remaining:
+        return datetime.fromtimestamp(min(map(_slot_ts, remaining)), UTC).replace(tzinfo=None)
+    tz = _user_tz(user)
+    tomorrow = (datetime.now(tz) + timedelta(days=1)).date()
+    midnight = datetime.combine(tomorrow, datetime.min.time(), tzinfo=tz)
+    return midnight.astimezone(UTC).replace(tzinfo=None)
+
+def _pop_due_utc(user, now_ts: int):
+    """
+    Remove and return the slots at or before now_ts (epoch seconds, computed once per tick).
+    `user` is a plain tick row (see _minute_tick), so the schedule is edited in place.
+    """
+    sched = user.schedule
+    remaining = sched.get("remaining_utc") if sched else None
     if not remaining:
         return []
-    now_utc_iso = _now_utc_minute().isoformat()
-    due = [t for t in remaining if t <= now_utc_iso]
+    remaining = [_slot_ts(t) for t in remaining]
+    due = [t for t in remaining if t <= now_ts]
     if due:
-        sched["remaining_utc"] = [t for t in remaining if t > now_utc_iso]
-        user.schedule = sched
+        sched["remaining_utc"] = [t for t in remaining if t > now_ts]
+        user.next_due_utc = _next_due_utc(user)
     return due
 
-scheduler = BackgroundScheduler(timezone=pytz.UTC)
+scheduler = BackgroundScheduler(timezone=UTC)
 
 def _minute_tick():
+    now_utc = _now_utc_minute()
+    now, now_ts = now_utc.replace(tzinfo=None), int(now_utc.timestamp())
     with SessionLocal() as session:
-        # pull all subscribed users
-        users = session.query(User).filter(User.subscribed.is_(True)).all()
-        changed_any = False
-        for u in users:
+        # only users with a slot due or a schedule to rebuild (indexed);
+        # NULL covers rows written before next_due_utc existed. Plain column
+        # rows: nothing lands in the identity map or gets instrumented.
+        rows = session.execute(
+            select(User.phone, User.track, User.per_day, User.timezone, User.schedule, User.updated_at)
+            .where(
+                User.subscribed.is_(True),
+                or_(User.next_due_utc.is_(None), User.next_due_utc <= now),
+            )
+        ).all()
+        outbox = []  # (phone, text), sent once the tick's state is saved
+        pending = []  # (change, updated_at as read, texts)
+        stamp = datetime.utcnow()  # one updated_at for every row this tick touches
+        for row in rows:
+            u = SimpleNamespace(**row._mapping)
             _ensure_todays_schedule(u)
-            due = _pop_due_utc(u)
-            if due:
-                for _ in due:
-                    # send a new question
-                    text, payload = _compose_question_text(u.track or "Consulting")
-                    u.open = payload
-                    # Outbound SMS (scheduled sends)
-                    send_sms(u.phone, text)
-                changed_any = True
-            if changed_any:
-                _save(session, u)
-
-# Run scheduler only when enabled (set RUN_SCHEDULER=1 on exactly one instance)
+            change = {"schedule": u.schedule, "updated_at": stamp}
+            texts = []
+            for _ in _pop_due_utc(u, now_ts):
+                # send a new question
+                text, payload = _compose_question_text(u.track or "Consulting")
+                change["open"] = payload
+                texts.append(text)
+            change["next_due_utc"] = u.next_due_utc
+            pending.append((u.phone, change, u.updated_at, texts))
+        # The tick holds no lock while it generates questions, so write each row
+        # only if it is unchanged since the read (every write bumps updated_at).
+        # A FREQ/TIMEZONE/answer committed meanwhile wins; that row is neither
+        # overwritten nor sent to, and stays due for the next tick.
+        written = []
+        for phone, change, seen, texts in pending:
+            res = session.execute(
+                sa_update(User)
+                .where(User.phone == phone, User.updated_at.is_not_distinct_from(seen))
+                .values(**change),
+                execution_options={"synchronize_session": False},
+            )
+            if res.rowcount:
+                written.append(phone)
+                outbox.extend((phone, text) for text in texts)
+        if pending:
+            session.commit()  # one commit for the whole tick
+    for phone in written:
+        _me_cache.pop(phone, None)
+
+    # Outbound SMS (scheduled sends); users drawn the same question share one
+    # bulk send, and the worker pool sends the rest concurrently. The tick may
+    # wait up to SMS_ENQUEUE_TIMEOUT in total for queue room.
+    by_text = {}
+    for phone, text in outbox:
+        by_text.setdefault(text, []).append(phone)
+    deadline = time.monotonic() + SMS_ENQUEUE_TIMEOUT
+    dropped = []
+    for text, phones in by_text.items():
+        dropped += send_sms_many(phones, text, timeout=max(0.0, deadline - time.monotonic()))
+    if dropped:
+        # Those users never got the question; clear it unless they've written since.
+        with SessionLocal() as session:
+            session.execute(
+                sa_update(User)
+                .where(User.phone.in_(dropped), User.updated_at == stamp)
+                .values(open=None)
+            )
+            session.commit()
+        for phone in dropped:
+            _me_cache.pop(phone, None)
+
+# Run scheduler only when enabled (set RUN_SCHEDULER=1 on exactly one instance;
+# the Procfile runs it in the clock process and sets RUN_SCHEDULER=0 for web)
 if os.getenv("RUN_SCHEDULER", "1") == "1":
     scheduler.add_job(_minute_tick, "interval", minutes=1, id="minute_tick", replace_existing=True)
     scheduler.start()
@@ -506,26 +818,50 @@ if os.getenv("RUN_SCHEDULER", "1") == "1":
 # -----------------------------
 # Twilio helpers
 # -----------------------------
+_TWIML_HEAD = '<?xml version="1.0" encoding="UTF-8"?>'
+
+def _twiml_xml(*messages) -> bytes:
+    """Render TwiML with one message per argument (same bytes MessagingResponse emits)."""
+    body = "".join(f"<Message>{_xml_escape(m)}</Message>" for m in messages if m)
+    xml = f"{_TWIML_HEAD}<Response>{body}</Response>" if body else f"{_TWIML_HEAD}<Response />"
+    return xml.encode("utf-8")
+
+def _twiml_bytes(xml: bytes):
+    return Response(xml, status=200, mimetype="text/xml")
+
 def _twiml(*messages):
     """Generate a TwiML response with one message per argument."""
-    resp = MessagingResponse()
-    for m in messages:
-        if not m:
-            continue
-        resp.message(html.escape(m))
-    xml = str(resp)
-    return Response(xml, status=200, mimetype="text/xml")
+    return _twiml_bytes(_twiml_xml(*messages))
+
+# Fixed replies, rendered once at import.
+_HELP_TWIML = _twiml_xml(
+    "Commands:",
+    "NEXT — new question now",
+    "TRACK <name> — change topic",
+    "FREQ <1-3> — messages/day",
+    "TIMEZONE <Area/City> — set your zone",
+    "Tracks: " + ", ".join(_list_tracks()[:10]) + ("..." if len(_list_tracks()) > 10 else ""),
+    "STOP — unsubscribe",
+)
+_STOP_TWIML = _twiml_xml("You have been unsubscribed. Text START to re-subscribe.")
+_EMPTY_TWIML = _twiml_xml()
+_UNKNOWN_TRACK_TWIML = _twiml_xml("Unknown track. Options: " + _TRACKS_STR)
+_FALLBACK_TWIML = _twiml_xml("Reply NEXT for a new question or HELP for commands.")
 
-def _welcome_text(user: User):
-    tzname = _user_tzname(user).split("/")[-1]
+@lru_cache(maxsize=256)
+def _welcome_text_cached(per_day, tz_short: str, start_h: int, end_h: int) -> str:
     return (
         "Welcome to BrainTrain Daily!\n"
-        f"You’ll receive {user.per_day} question(s) randomly between "
-        f"{WINDOW_START_HOUR:02d}:00–{WINDOW_END_HOUR:02d}:00 {tzname}.\n"
+        f"You’ll receive {per_day} question(s) randomly between "
+        f"{start_h:02d}:00–{end_h:02d}:00 {tz_short}.\n"
         "Commands: HELP, NEXT, TRACK <name>, FREQ <1-3>, TIMEZONE <Area/City>.\n"
         "Unsubscribe any time: STOP."
     )
 
+def _welcome_text(user: User):
+    tzname = _user_tzname(user).split("/")[-1]
+    return _welcome_text_cached(user.per_day, tzname, WINDOW_START_HOUR, WINDOW_END_HOUR)
+
 # -----------------------------
 # Public API (signup + prefs)
 # -----------------------------
@@ -534,19 +870,30 @@ def signup():
     """
     JSON body: {phone, name?, track?, per_day?, timezone?}
     - creates/updates the user
-    - sends onboarding + first question immediately
+    - queues onboarding + first question for immediate send (202 Accepted)
     - builds today’s schedule for future random sends
     """
     data = request.get_json(force=True, silent=True) or {}
     phone = _normalize_phone(data.get("phone") or "")
     if not phone:
         return jsonify({"error": "Phone required"}), 400
-
+    if not _valid_e164(phone):
+        return jsonify({"error": "Invalid phone"}), 400
+    track = data.get("track")
+    if track is not None:
+        track = _valid_track(track)
+        if track is None:
+            return jsonify({"error": "Unknown track"}), 400
+
+    # OpenAI can take seconds: compose the first question before taking the row lock
+    text, payload = _compose_question_text(track or _stored_track(phone) or "Consulting")
+
+    now = datetime.utcnow()
     with SessionLocal() as session:
-        u = _ensure_user(session, phone)
+        u = _ensure_user(session, phone, now, lock=True)
         if data.get("name") is not None: u.name = data["name"]
-        if data.get("track") is not None: u.track = data["track"]
-        if data.get("timezone") is not None: u.timezone = data["timezone"]
+        if track is not None: u.track = track
+        if data.get("timezone") is not None: u.timezone = _canonical_tz(data["timezone"]) or data["timezone"]
         if data.get("per_day") is not None:
             try:
                 u.per_day = max(1, min(3, int(data["per_day"])))
@@ -557,27 +904,35 @@ def signup():
         tz = _user_tz(u)
         u.schedule = {"local_date": _today_local_date_str(tz), "remaining_utc": []}
         _ensure_todays_schedule(u)
-        _save(session, u)
 
         # Onboarding + first question right now
         instructions = _welcome_text(u)
-        text, payload = _compose_question_text(u.track or "Consulting")
         u.open = payload
-        _save(session, u)
-        send_sms(u.phone, instructions + "\n\n" + text)
+        _save(session, u, now)  # single commit for the profile, schedule and open question
+        if not send_sms(u.phone, instructions + "\n\n" + text):
+            u.open = None  # never delivered, so don't grade replies against it
+            _save(session, u)
+            return jsonify({"error": "Busy, please try again"}), 503
 
-    return jsonify({"ok": True})
+    return jsonify({"ok": True}), 202
 
 @app.get("/me")
 def me():
     phone = _normalize_phone(request.args.get("phone") or "")
     if not phone:
         return ("Phone required", 400)
+    if not _valid_e164(phone):
+        return ("Invalid phone", 400)
+    hit = _me_cache_get(phone)
+    if hit is not None:
+        return Response(hit, mimetype="application/json")
     with SessionLocal() as session:
         u = _get_user(session, phone)
         if not u:
             return ("Not found", 404)
-        return jsonify(_serialize_user(u))
+        resp = jsonify(_serialize_user(u))
+    _me_cache_put(phone, resp.get_data())
+    return resp
 
 @app.post("/update")
 def update():
@@ -585,14 +940,21 @@ def update():
     phone = _normalize_phone(data.get("phone") or "")
     if not phone:
         return jsonify({"error": "Phone required"}), 400
+    if not _valid_e164(phone):
+        return jsonify({"error": "Invalid phone"}), 400
+    track = data.get("track")
+    if track is not None:
+        track = _valid_track(track)
+        if track is None:
+            return jsonify({"error": "Unknown track"}), 400
     with SessionLocal() as session:
-        u = _get_user(session, phone)
+        u = _get_user(session, phone, lock=True)
         if not u:
             return jsonify({"error": "Not found"}), 404
 
         if data.get("name") is not None: u.name = data["name"]
-        if data.get("track") is not None: u.track = data["track"]
-        if data.get("timezone") is not None: u.timezone = data["timezone"]
+        if track is not None: u.track = track
+        if data.get("timezone") is not None: u.timezone = _canonical_tz(data["timezone"]) or data["timezone"]
         if data.get("per_day") is not None:
             try:
                 u.per_day = max(1, min(3, int(data["per_day"])))
@@ -604,93 +966,105 @@ def update():
 # -----------------------------
 # Twilio webhook
 # -----------------------------
+# Command handlers: (session, user, rest of the message after the command) -> response.
+# NEXT and TRACK also take the question /sms composed before locking the row.
+def _cmd_stop(session, u: User, rest: str):
+    u.subscribed = False
+    _save(session, u)
+    return _twiml_bytes(_STOP_TWIML)
+
+def _cmd_start(session, u: User, rest: str):
+    u.subscribed = True
+    _save(session, u)
+    return _twiml("You are re-subscribed.", _welcome_text(u))
+
+def _cmd_help(session, u: User, rest: str):
+    return _twiml_bytes(_HELP_TWIML)
+
+def _cmd_track(session, u: User, rest: str, question=None):
+    choice = _valid_track(rest)
+    if choice is None:
+        return _twiml_bytes(_UNKNOWN_TRACK_TWIML)
+    u.track = choice
+    text, payload = question or _compose_question_text(choice)  # a fresh question in the new track
+    u.open = payload
+    _save(session, u)
+    return _twiml(f"Track changed to {choice}.", text)
+
+def _cmd_freq(session, u: User, rest: str):
+    digits = _NONDIGIT_RE.sub("", rest)
+    if not digits:
+        return _twiml("Please send FREQ 1, FREQ 2, or FREQ 3.")
+    val = max(1, min(3, int(digits)))
+    u.per_day = val
+    tz = _user_tz(u)
+    u.schedule = {"local_date": _today_local_date_str(tz), "remaining_utc": []}
+    _ensure_todays_schedule(u)
+    _save(session, u)
+    return _twiml(f"Frequency updated: {val} per day between {WINDOW_START_HOUR:02d}:00–{WINDOW_END_HOUR:02d}:00.")
+
+def _cmd_timezone(session, u: User, rest: str):
+    z = _canonical_tz(rest)
+    if z is None:
+        return _twiml("Invalid timezone. Example: TIMEZONE America/Los_Angeles")
+    u.timezone = z
+    u.schedule = {"local_date": _today_local_date_str(_user_tz(u)), "remaining_utc": []}
+    _ensure_todays_schedule(u)
+    _save(session, u)
+    return _twiml(f"Timezone set to {z}.")
+
+def _cmd_next(session, u: User, rest: str, question=None):
+    text, payload = question or _compose_question_text(u.track or "Consulting")
+    u.open = payload
+    _save(session, u)
+    return _twiml(text)
+
+# First word of the SMS (letters only, upper-cased) -> handler
+COMMANDS = {
+    **dict.fromkeys(("STOP", "STOPALL", "UNSUBSCRIBE", "CANCEL", "END", "QUIT"), _cmd_stop),
+    "START": _cmd_start,
+    **dict.fromkeys(("HELP", "H", "?"), _cmd_help),
+    "TRACK": _cmd_track,
+    "FREQ": _cmd_freq,
+    "TIMEZONE": _cmd_timezone,
+    "NEXT": _cmd_next,
+}
+
 @app.route("/sms", methods=["GET", "POST"])
 def sms():
     if request.method == "GET":
         return Response("OK: /sms reachable. Twilio must POST.", mimetype="text/plain")
 
     from_phone = _normalize_phone(request.values.get("From") or "")
+    if not _valid_e164(from_phone):
+        # malformed or missing sender: answer with an empty reply, no DB work
+        return _twiml_bytes(_EMPTY_TWIML)
     body = (request.values.get("Body") or "").strip()
 
-    with SessionLocal() as session:
-        u = _ensure_user(session, from_phone)
-        text_upper = body.upper()
-        parts = text_upper.split()
-        cmd_raw = parts[0] if parts else ""
-        cmd = re.sub(r"[^A-Z]", "", cmd_raw)
-        if not cmd and "?" in cmd_raw:
-            cmd = "?"
-
-        # Opt-out / in
-        if cmd in {"STOP", "STOPALL", "UNSUBSCRIBE", "CANCEL", "END", "QUIT"}:
-            u.subscribed = False
-            _save(session, u)
-            return _twiml("You have been unsubscribed. Text START to re-subscribe.")
-        if cmd == "START":
-            u.subscribed = True
-            _save(session, u)
-            return _twiml("You are re-subscribed.", _welcome_text(u))
-
-        # HELP
-        if cmd in {"HELP", "H", "?"}:
-            tracks_line = ", ".join(_list_tracks()[:10]) + ("..." if len(_list_tracks()) > 10 else "")
-            return _twiml(
-                "Commands:",
-                "NEXT — new question now",
-                "TRACK <name> — change topic",
-                "FREQ <1-3> — messages/day",
-                "TIMEZONE <Area/City> — set your zone",
-                f"Tracks: {tracks_line}",
-                "STOP — unsubscribe"
-            )
+    # any whitespace separates the command word, as with the old split()
+    head, rest = (body.split(None, 1) + ["", ""])[:2]
+    cmd = _NON_ALPHA_UP_RE.sub("", head.upper())
+    if not cmd and "?" in head:
+        cmd = "?"
+    handler = COMMANDS.get(cmd) or (_cmd_next if not body else None)
+
+    # NEXT/TRACK send a fresh question; compose it (possibly a slow OpenAI call)
+    # before the row lock so the lock only covers the read-modify-write below
+    question = None
+    if handler is _cmd_next:
+        question = _compose_question_text(_stored_track(from_phone) or "Consulting")
+    elif handler is _cmd_track:
+        choice = _valid_track(rest)
+        if choice is not None:
+            question = _compose_question_text(choice)
 
-        # TRACK change
-        if cmd == "TRACK":
-            _, _, maybe = body.partition(" ")
-            choice = (maybe or "").strip()
-            if choice not in QUESTIONS:
-                return _twiml("Unknown track. Options: " + ", ".join(_list_tracks()))
-            u.track = choice
-            _save(session, u)
-            text, payload = _compose_question_text(choice)  # send a fresh question in the new track
-            u.open = payload
-            _save(session, u)
-            return _twiml(f"Track changed to {choice}.", text)
-
-        # FREQ change
-        if cmd == "FREQ":
-            _, _, maybe = body.partition(" ")
-            digits = re.sub(r"\D", "", maybe or "")
-            if not digits:
-                return _twiml("Please send FREQ 1, FREQ 2, or FREQ 3.")
-            val = max(1, min(3, int(digits)))
-            u.per_day = val
-            tz = _user_tz(u)
-            u.schedule = {"local_date": _today_local_date_str(tz), "remaining_utc": []}
-            _ensure_todays_schedule(u)
-            _save(session, u)
-            return _twiml(f"Frequency updated: {val} per day between {WINDOW_START_HOUR:02d}:00–{WINDOW_END_HOUR:02d}:00.")
-
-        # TIMEZONE change
-        if cmd == "TIMEZONE":
-            _, _, maybe = body.partition(" ")
-            z = (maybe or "").strip()
-            try:
-                pytz.timezone(z)
-            except Exception:
-                return _twiml("Invalid timezone. Example: TIMEZONE America/Los_Angeles")
-            u.timezone = z
-            u.schedule = {"local_date": _today_local_date_str(_user_tz(u)), "remaining_utc": []}
-            _ensure_todays_schedule(u)
-            _save(session, u)
-            return _twiml(f"Timezone set to {z}.")
-
-        # NEXT (or empty)
-        if cmd == "NEXT" or body.strip() == "":
-            text, payload = _compose_question_text(u.track or "Consulting")
-            u.open = payload
-            _save(session, u)
-            return _twiml(text)
+    with SessionLocal() as session:
+        # row lock: two texts from one phone can't interleave their stats/open updates
+        u = _ensure_user(session, from_phone, lock=True)
+        if question is not None:
+            return handler(session, u, rest, question)
+        if handler is not None:
+            return handler(session, u, rest)
 
         # Otherwise: try grading if there’s an open question
         graded = _grade_open(session, u, body)
@@ -699,7 +1073,7 @@ def sms():
             return _twiml(graded["body"])
 
         # Fallback
-        return _twiml("Reply NEXT for a new question or HELP for commands.")
+        return _twiml_bytes(_FALLBACK_TWIML)
 
 # -----------------------------
 # Entrypoint
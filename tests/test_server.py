@@ -0,0 +1,153 @@
+import os, sys, time, tempfile
+
+# Configure before server/db import: throwaway SQLite, no scheduler, no OpenAI.
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ["RUN_SCHEDULER"] = "0"
+os.environ.pop("OPENAI_API_KEY", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import server
+
+
+@pytest.fixture
+def client(monkeypatch):
+    sent = []
+    monkeypatch.setattr(server, "send_sms", lambda to, body: sent.append((to, body)) or True)
+    c = server.app.test_client()
+    c.sent = sent
+    return c
+
+
+def test_normalize_phone_placeholder_format():
+    assert server._normalize_phone("+1 508-555-1234") == "+15085551234"
+    assert server._normalize_phone("+1 (508) 555.1234") == "+15085551234"
+    assert server._normalize_phone("508-555-1234") == "+15085551234"
+    assert server._valid_e164(server._normalize_phone("+1 508-555-1234"))
+
+
+def test_signup_placeholder_format(client):
+    r = client.post("/signup", json={"phone": "+1 508-555-1234", "track": "Consulting"})
+    assert r.status_code == 202
+    assert client.sent[0][0] == "+15085551234"
+
+
+def test_me_lookup_formatted_phone(client):
+    client.post("/signup", json={"phone": "5085550000", "track": "Consulting"})
+    r = client.get("/me", query_string={"phone": "+1 508-555-0000"})
+    assert r.status_code == 200
+    assert r.get_json()["phone"] == "+15085550000"
+
+
+def test_timezone_any_case(client):
+    assert server._canonical_tz("america/los_angeles") == "America/Los_Angeles"
+    assert server._canonical_tz("Mars/Olympus") is None
+    assert str(server._user_tz(server.SimpleNamespace(timezone="europe/paris"))) == "Europe/Paris"
+    client.post("/signup", json={"phone": "5085550001", "timezone": "america/chicago"})
+    assert client.get("/me?phone=5085550001").get_json()["timezone"] == "America/Chicago"
+    r = client.post("/sms", data={"From": "+15085550001", "Body": "TIMEZONE america/los_angeles"})
+    assert b"Timezone set to America/Los_Angeles." in r.data
+
+
+def test_send_sms_reports_full_queue(monkeypatch):
+    import queue
+    monkeypatch.setattr(server, "_sms_queue", queue.Queue(maxsize=1))
+    assert server.send_sms("+15085550002", "hi") is True
+    assert server.send_sms("+15085550003", "hi") is False
+    assert server.send_sms("+15085550003", "hi", timeout=0.01) is False
+    assert server.send_sms_many(["+15085550004"], "hi", timeout=0.01) == ["+15085550004"]
+
+
+def test_tick_clears_open_when_send_dropped(client, monkeypatch):
+    from db import SessionLocal, User
+    client.post("/signup", json={"phone": "5085550005", "track": "GMAT"})
+    with SessionLocal() as s:
+        u = s.get(User, "+15085550005")
+        u.open = None
+        u.next_due_utc = None
+        u.schedule = {"local_date": server._today_local_date_str(server._user_tz(u)),
+                      "remaining_utc": [int(time.time()) - 60]}
+        s.commit()
+    monkeypatch.setattr(server, "send_sms", lambda to, body, timeout=None: False)
+    server._minute_tick()
+    with SessionLocal() as s:
+        u = s.get(User, "+15085550005")
+        assert u.open is None
+        assert u.schedule["remaining_utc"] == []
+
+
+def test_tick_skips_rows_changed_during_generation(client, monkeypatch):
+    from db import SessionLocal, User
+    client.post("/signup", json={"phone": "5085550006", "track": "GMAT"})
+    with SessionLocal() as s:
+        u = s.get(User, "+15085550006")
+        u.next_due_utc = None
+        u.schedule = {"local_date": server._today_local_date_str(server._user_tz(u)),
+                      "remaining_utc": [int(time.time()) - 60]}
+        s.commit()
+    compose = server._compose_question_text
+    seen = {}
+
+    def compose_while_user_texts(track):
+        # An /sms FREQ lands while the tick is generating the question
+        client.post("/sms", data={"From": "+15085550006", "Body": "FREQ 3"})
+        with SessionLocal() as s:
+            seen["schedule"] = s.get(User, "+15085550006").schedule
+        return compose(track)
+
+    monkeypatch.setattr(server, "_compose_question_text", compose_while_user_texts)
+    client.sent.clear()
+    server._minute_tick()
+    with SessionLocal() as s:
+        u = s.get(User, "+15085550006")
+        assert u.per_day == 3
+        assert u.schedule == seen["schedule"]
+    assert client.sent == []
+
+
+@pytest.mark.parametrize("body", ["FREQ 2", "FREQ\t2", "FREQ  2", "freq\n2"])
+def test_sms_command_any_whitespace(client, body):
+    client.post("/signup", json={"phone": "5085550007"})
+    r = client.post("/sms", data={"From": "+15085550007", "Body": body})
+    assert b"Frequency updated: 2 per day" in r.data
+
+
+def test_next_composes_question_before_row_lock(client, monkeypatch):
+    client.post("/signup", json={"phone": "5085550008", "track": "GMAT"})
+    calls = []
+    get_user = server._get_user
+    compose = server._compose_question_text
+    monkeypatch.setattr(server, "_get_user",
+                        lambda s, p, lock=False: calls.append(("lock" if lock else "get")) or get_user(s, p, lock))
+    monkeypatch.setattr(server, "_compose_question_text",
+                        lambda track: calls.append(("compose", track)) or compose(track))
+    client.post("/sms", data={"From": "+15085550008", "Body": "NEXT"})
+    assert calls == [("compose", "GMAT"), "lock"]
+    calls.clear()
+    client.post("/sms", data={"From": "+15085550008", "Body": "TRACK Consulting"})
+    assert calls == [("compose", "Consulting"), "lock"]
+
+
+def test_valid_track_returns_bank_key():
+    name = "".join(["GM", "AT"])  # built at runtime, so not the bank's own object
+    assert server._valid_track(" " + name + " ") is server.ALLOWED_TRACKS["GMAT"]
+    assert server._valid_track("Nope") is None
+
+
+def test_me_cache_is_bounded_lru(monkeypatch):
+    monkeypatch.setattr(server, "_me_cache", server.OrderedDict())
+    monkeypatch.setattr(server, "ME_CACHE_MAX", 2)
+    server._me_cache_put("+1", b"a")
+    server._me_cache_put("+2", b"b")
+    assert server._me_cache_get("+1") == b"a"   # +1 is now most recent
+    server._me_cache_put("+3", b"c")            # evicts +2, the least recent
+    assert list(server._me_cache) == ["+1", "+3"]
+    monkeypatch.setattr(server, "ME_CACHE_TTL", 0)
+    assert server._me_cache_get("+1") is None
+    assert "+1" not in server._me_cache
+
+
+def test_bulk_send_log_label_is_short():
+    phones = tuple(f"+1508555{i:04d}" for i in range(5000))
+    assert server._recipients(phones) == "5000 recipients (+15085550000…)"
+    assert server._recipients("+15085550000") == "+15085550000"
@@ -0,0 +1,18 @@
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import tracks
+
+Q = tracks.QUESTIONS["GMAT"][0]  # correct answer is choice C
+
+
+@pytest.mark.parametrize("reply", ["3", "03", "٣", "C", "c", Q["answer"].lower()])
+def test_grade_answer_accepts_choice(reply):
+    assert tracks.grade_answer("GMAT", Q["id"], reply)["correct"] is True
+
+
+@pytest.mark.parametrize("reply", ["+3", "3_0", "²", "0", "9"])
+def test_grade_answer_rejects_non_plain_digits(reply):
+    assert tracks.grade_answer("GMAT", Q["id"], reply)["correct"] is False
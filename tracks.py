@@ -1,14 +1,41 @@
 # tracks.py
-import re, math, random
+import random
+from functools import lru_cache
+from types import MappingProxyType
 
 # ---------- helpers ----------
+def _first_number(s: str):
+    """The first -?digits(.digits)? span of an ASCII string, without the regex engine."""
+    n = len(s)
+    i = 0
+    while i < n:
+        c = s[i]
+        if "0" <= c <= "9" or (c == "-" and i + 1 < n and "0" <= s[i + 1] <= "9"):
+            break
+        i += 1
+    else:
+        return None
+    j = i + 1
+    while j < n and "0" <= s[j] <= "9":
+        j += 1
+    if j + 1 < n and s[j] == "." and "0" <= s[j + 1] <= "9":
+        j += 2
+        while j < n and "0" <= s[j] <= "9":
+            j += 1
+    return s[i:j]
+
 def parse_number(ans: str) -> float:
     """
     Turn inputs like '1,200', '1.2k', '12%' into floats.
     - 'k' -> *1000
     - '%' -> /100
     """
-    s = (ans or "").strip().lower().replace(",", "")
+    return _parse_number_cached(ans or "")
+
+@lru_cache(maxsize=1024)
+def _parse_number_cached(ans: str) -> float:
+    # replies repeat ("10", "1.2k"), so memoize; failures raise and aren't cached
+    s = ans.strip().lower().replace(",", "")
     mult = 1.0
     if s.endswith("%"):
         s = s[:-1]
@@ -19,10 +46,15 @@ def parse_number(ans: str) -> float:
     try:
         return float(s) * mult
     except Exception:
-        m = re.findall(r"-?\d+(?:\.\d+)?", s)
-        if not m:
+        if s.isascii():
+            num = _first_number(s)
+        else:  # \d also matches non-ASCII digits; leave those to the regex
+            import re  # only non-ASCII salvage needs it; re caches the compiled pattern
+            m = re.search(r"-?\d+(?:\.\d+)?", s)
+            num = m.group(0) if m else None
+        if num is None:
             raise ValueError("no number found")
-        return float(m[0]) * mult
+        return float(num) * mult
 
 
 # ---------- knowledge questions (expanded) ----------
@@ -421,6 +453,25 @@ QUESTIONS = {
     ],
 }
 
+# (track, qid) -> question, built once so grading is a dict lookup
+_QID_INDEX = {(track, q["id"]): q for track, qs in QUESTIONS.items() for q in qs}
+
+# Grading tables that only depend on the question, attached once at import.
+for _q in _QID_INDEX.values():
+    _choices = _q["choices"] = tuple(_q.get("choices") or ())
+    # grading only compares normalized text, so store choices that way
+    _q["_choices_upper"] = tuple(c.strip().upper() for c in _choices)
+    _q["_letter_map"] = {chr(65 + i): c for i, c in enumerate(_q["_choices_upper"])}  # A,B,C,D,E...
+    _q["_answer_upper"] = _q["answer"].strip().upper()
+    _q["_correct_letter"] = next(
+        ("ABCDE"[i] for i, c in enumerate(_choices[:5]) if c == _q["answer"]), None
+    )
+del _q, _choices
+
+# Freeze the bank once the tables are attached; nothing mutates it after import.
+QUESTIONS = {track: tuple(MappingProxyType(q) for q in qs) for track, qs in QUESTIONS.items()}
+_QID_INDEX = {(track, q["id"]): q for track, qs in QUESTIONS.items() for q in qs}
+
 
 def pick_sample_question(track: str):
     qs = QUESTIONS.get(track)
@@ -428,136 +479,165 @@ def pick_sample_question(track: str):
 
 
 def grade_answer(track: str, qid: str, answer: str):
-    qs = QUESTIONS.get(track) or []
-    for q in qs:
-        if q["id"] == qid:
-            user_raw = (answer or "").strip()
-            user_up  = user_raw.upper()
-
-            # Allow A–E or 1–5
-            choices = q.get("choices") or []
-            letter_map = {chr(65 + i): c for i, c in enumerate(choices)}  # A,B,C,D,E...
-            if user_up in letter_map:
-                user_choice = letter_map[user_up]
-            elif user_up.isdigit() and 1 <= int(user_up) <= len(choices):
-                user_choice = choices[int(user_up) - 1]
-            else:
-                # Fall back to matching full text, case-insensitive
-                user_choice = next(
-                    (c for c in choices if c.strip().upper() == user_up),
-                    user_raw,
-                )
-
-            correct_text = q["answer"]
-            correct = correct_text.strip().upper() == str(user_choice).strip().upper()
-
-            # Compute the correct letter if we have choices
-            try:
-                idx = choices.index(correct_text)
-                correct_letter = "ABCDE"[idx]
-            except Exception:
-                correct_letter = None
-
-            return {
-                "correct": correct,
-                "correct_answer": correct_text,
-                "correct_letter": correct_letter,
-                "rationale": q.get("rationale"),
-                "tip": q.get("tip"),
-            }
-    return {"error": "Question not found"}
+    q = _QID_INDEX.get((track, qid))
+    if q is None:
+        return {"error": "Question not found"}
+
+    user_up = (answer or "").strip().upper()
+
+    # Allow A–E or 1–5
+    choices_upper = q["_choices_upper"]
+    letter_map = q["_letter_map"]
+    if user_up in letter_map:
+        user_choice = letter_map[user_up]
+    else:
+        # Full text, case-insensitive: the normalized reply is already comparable
+        user_choice = user_up
+        # digits only, as before: int() alone would also take "+1" or "1_0";
+        # isdecimal() rather than isdigit(), which passes "²" that int() rejects
+        if user_up.isdecimal():
+            n = int(user_up)
+            if 1 <= n <= len(choices_upper):
+                user_choice = choices_upper[n - 1]
+
+    correct_text = q["answer"]
+    correct = user_choice == q["_answer_upper"]
+
+    return {
+        "correct": correct,
+        "correct_answer": correct_text,
+        "correct_letter": q["_correct_letter"],
+        "rationale": q.get("rationale"),
+        "tip": q.get("tip"),
+    }
 
 
 
 # ---------- mental math generators (expanded consulting context) ----------
+def _gen_sub():
+    a = random.randint(120, 999)
+    b = random.randint(20, 119)
+    if b > a: a, b = b, a
+    expected = a - b
+    q = f"{a} - {b} = ?"
+    qid = f"mm_gen_sub:{a}:{b}:{expected}"
+    return {"qid": qid, "question": q, "expected": expected, "tolerance": 0.0, "units": None}
+
+_PCT_RATES = (4, 5, 6, 7, 8, 9, 10, 12, 15, 20, 25)
+
+def _gen_pct():
+    p = random.choice(_PCT_RATES)
+    n = random.randint(30, 499)
+    expected = round(n * p / 100.0, 2)
+    q = f"{p}% of {n} = ?"
+    qid = f"mm_gen_pct:{p}:{n}:{expected}"
+    return {"qid": qid, "question": q, "expected": expected, "tolerance": max(0.5, 0.02*abs(expected)), "units": None}
+
+_DIV_DENS = (12, 24, 36, 48, 60)
+
+def _gen_div():
+    # simple division rounding
+    num = random.randint(4_000, 90_000)
+    den = random.choice(_DIV_DENS)
+    expected = round(num/den, 2)
+    q = f"{num} ÷ {den} = ?"
+    qid = f"mm_gen_div:{num}:{den}:{expected}"
+    return {"qid": qid, "question": q, "expected": expected, "tolerance": 0.02*abs(expected), "units": None}
+
+# (generators, weights): one weighted draw picks the question type
+_GEN_GENERAL = ((_gen_sub, _gen_pct, _gen_div), (0.4, 0.4, 0.2))
+
 def gen_general_math():
     # subtraction / percent-of / quick division to integer
-    r = random.random()
-    if r < 0.4:
-        a = random.randint(120, 999)
-        b = random.randint(20, 119)
-        if b > a: a, b = b, a
-        expected = a - b
-        q = f"{a} - {b} = ?"
-        qid = f"mm_gen_sub:{a}:{b}:{expected}"
-        return {"qid": qid, "question": q, "expected": expected, "tolerance": 0.0, "units": None}
-    elif r < 0.8:
-        p = random.choice([4,5,6,7,8,9,10,12,15,20,25])
-        n = random.randint(30, 499)
-        expected = round(n * p / 100.0, 2)
-        q = f"{p}% of {n} = ?"
-        qid = f"mm_gen_pct:{p}:{n}:{expected}"
-        return {"qid": qid, "question": q, "expected": expected, "tolerance": max(0.5, 0.02*abs(expected)), "units": None}
-    else:
-        # simple division rounding
-        num = random.randint(4_000, 90_000)
-        den = random.choice([12, 24, 36, 48, 60])
-        expected = round(num/den, 2)
-        q = f"{num} ÷ {den} = ?"
-        qid = f"mm_gen_div:{num}:{den}:{expected}"
-        return {"qid": qid, "question": q, "expected": expected, "tolerance": 0.02*abs(expected), "units": None}
+    return random.choices(*_GEN_GENERAL)[0]()
 
 
 def _vtarget_units(price, var, fixed, target):
     cm = price - var
-    return math.ceil((fixed + target) / cm)
+    return -(-(fixed + target) // cm)
 
 def _breakeven_units(price, var, fixed):
     cm = price - var
-    return math.ceil(fixed / cm)
+    return -(-fixed // cm)
 
 def _margin_pct(price, var):
     return (price - var) / price * 100.0
 
+# Parameter pools for the consulting generators, built once rather than per call
+_VTARGET_PRICES = (120, 200, 250, 300, 350)
+_VTARGET_VARS = (40, 60, 80, 100, 120, 180)
+_VTARGET_FIXED = (600_000, 800_000, 1_200_000, 1_500_000)
+_VTARGET_TARGETS = (300_000, 600_000, 900_000)
+_BREAKEVEN_PRICES = (60, 96, 120, 180)
+_BREAKEVEN_VARS = (10, 12, 20, 30)
+_BREAKEVEN_FIXED = (240_000, 360_000, 480_000, 600_000)
+_MARGIN_PRICES = (50, 80, 100, 120, 200, 250, 300)
+_MARGIN_VARS = (10, 20, 30, 40, 60, 90, 120)
+_PRICEMARGIN_VARS = (20, 40, 60, 90, 120)
+_PRICEMARGIN_TARGETS = (30, 40, 50, 60)  # as %
+
+def _gen_vtarget():
+    # target profit units (physical)
+    price = random.choice(_VTARGET_PRICES)
+    var = random.choice(_VTARGET_VARS)
+    fixed = random.choice(_VTARGET_FIXED)
+    target = random.choice(_VTARGET_TARGETS)
+    units = _vtarget_units(price, var, fixed, target)
+    q = (f"A product sells for ${price}. Variable cost is ${var}. Fixed costs are ${fixed:,}/yr. "
+         f"What sales volume is needed to earn ${target:,} annual profit?")
+    qid = f"mm_cons_vtarget:{price}:{var}:{fixed}:{target}:{units}"
+    return {"qid": qid, "question": q, "expected": units, "tolerance": 0.5, "units": "units"}
+
+def _gen_breakeven():
+    # breakeven units (SaaS style)
+    price = random.choice(_BREAKEVEN_PRICES)
+    var = random.choice(_BREAKEVEN_VARS)
+    fixed = random.choice(_BREAKEVEN_FIXED)
+    units = _breakeven_units(price, var, fixed)
+    q = (f"A SaaS company charges ${price}/user/year. Variable cost per user is ${var}/year. "
+         f"Fixed costs are ${fixed:,}/year. How many users are needed to break even?")
+    qid = f"mm_cons_breakeven:{price}:{var}:{fixed}:{units}"
+    return {"qid": qid, "question": q, "expected": units, "tolerance": 0.5, "units": "users"}
+
+def _gen_marginpct():
+    # margin percent
+    price = random.choice(_MARGIN_PRICES)
+    var = random.choice(_MARGIN_VARS)
+    margin = round(_margin_pct(price, var), 1)
+    q = (f"Price is ${price}, variable cost ${var}. What is the contribution margin percent?")
+    qid = f"mm_cons_marginpct:{price}:{var}:{margin}"
+    return {"qid": qid, "question": q, "expected": margin, "tolerance": 0.5, "units": "%"}
+
+def _gen_pricemargin():
+    # price needed to hit target margin %
+    var = random.choice(_PRICEMARGIN_VARS)
+    target_margin = random.choice(_PRICEMARGIN_TARGETS)
+    # target_margin% = (P - var)/P → P = var / (1 - m)
+    P = var / (1 - target_margin/100.0)
+    price_needed = round(P, 2)
+    q = (f"Variable cost is ${var}. What price achieves a {target_margin}% contribution margin?")
+    qid = f"mm_cons_pricemargin:{var}:{target_margin}:{price_needed}"
+    return {"qid": qid, "question": q, "expected": price_needed, "tolerance": max(0.01*price_needed, 0.5), "units": "$"}
+
+_GEN_CONSULTING = (
+    (_gen_vtarget, _gen_breakeven, _gen_marginpct, _gen_pricemargin),
+    (0.45, 0.30, 0.15, 0.10),
+)
+
 def gen_consulting_context():
     # choose among (a) target units, (b) breakeven units, (c) margin %, (d) price needed to hit margin
-    choice = random.random()
-    if choice < 0.45:
-        # target profit units (physical)
-        price = random.choice([120, 200, 250, 300, 350])
-        var = random.choice([40, 60, 80, 100, 120, 180])
-        fixed = random.choice([600_000, 800_000, 1_200_000, 1_500_000])
-        target = random.choice([300_000, 600_000, 900_000])
-        units = _vtarget_units(price, var, fixed, target)
-        q = (f"A product sells for ${price}. Variable cost is ${var}. Fixed costs are ${fixed:,}/yr. "
-             f"What sales volume is needed to earn ${target:,} annual profit?")
-        qid = f"mm_cons_vtarget:{price}:{var}:{fixed}:{target}:{units}"
-        return {"qid": qid, "question": q, "expected": units, "tolerance": 0.5, "units": "units"}
-    elif choice < 0.75:
-        # breakeven units (SaaS style)
-        price = random.choice([60, 96, 120, 180])
-        var = random.choice([10, 12, 20, 30])
-        fixed = random.choice([240_000, 360_000, 480_000, 600_000])
-        units = _breakeven_units(price, var, fixed)
-        q = (f"A SaaS company charges ${price}/user/year. Variable cost per user is ${var}/year. "
-             f"Fixed costs are ${fixed:,}/year. How many users are needed to break even?")
-        qid = f"mm_cons_breakeven:{price}:{var}:{fixed}:{units}"
-        return {"qid": qid, "question": q, "expected": units, "tolerance": 0.5, "units": "users"}
-    elif choice < 0.9:
-        # margin percent
-        price = random.choice([50, 80, 100, 120, 200, 250, 300])
-        var = random.choice([10, 20, 30, 40, 60, 90, 120])
-        margin = round(_margin_pct(price, var), 1)
-        q = (f"Price is ${price}, variable cost ${var}. What is the contribution margin percent?")
-        qid = f"mm_cons_marginpct:{price}:{var}:{margin}"
-        return {"qid": qid, "question": q, "expected": margin, "tolerance": 0.5, "units": "%"}
-    else:
-        # price needed to hit target margin %
-        var = random.choice([20, 40, 60, 90, 120])
-        target_margin = random.choice([30, 40, 50, 60])  # as %
-        # target_margin% = (P - var)/P → P = var / (1 - m)
-        P = var / (1 - target_margin/100.0)
-        price_needed = round(P, 2)
-        q = (f"Variable cost is ${var}. What price achieves a {target_margin}% contribution margin?")
-        qid = f"mm_cons_pricemargin:{var}:{target_margin}:{price_needed}"
-        return {"qid": qid, "question": q, "expected": price_needed, "tolerance": max(0.01*price_needed, 0.5), "units": "$"}
+    return random.choices(*_GEN_CONSULTING)[0]()
+
 
+_IRR_INITIALS = (20_000, 50_000, 75_000, 100_000)
+_IRR_MULTIPLES = (1.8, 2.0, 2.5, 3.0, 4.0)
+_IRR_YEARS = (3, 4, 5, 6, 7)
 
 def gen_ib_math():
     # IRR/CAGR: initial -> final over years
-    initial = random.choice([20_000, 50_000, 75_000, 100_000])
-    multiple = random.choice([1.8, 2.0, 2.5, 3.0, 4.0])
-    years = random.choice([3,4,5,6,7])
+    initial = random.choice(_IRR_INITIALS)
+    multiple = random.choice(_IRR_MULTIPLES)
+    years = random.choice(_IRR_YEARS)
     final = int(initial * multiple)
     irr = (final / initial) ** (1.0 / years) - 1.0
     irr_pct = irr * 100.0
@@ -568,14 +648,88 @@ def gen_ib_math():
     return {"qid": qid, "question": q, "expected": irr_pct, "tolerance": tol, "units": "%"}
 
 
+_MM_GENERATORS = {
+    "General": gen_general_math,
+    "Consulting": gen_consulting_context,
+    "Investment Banking": gen_ib_math,
+}
+
 def make_math_question(track: str):
-    if track == "General":
-        return gen_general_math()
-    if track == "Consulting":
-        return gen_consulting_context()
-    if track == "Investment Banking":
-        return gen_ib_math()
-    return None
+    gen = _MM_GENERATORS.get(track)
+    return gen() if gen else None
+
+
+# ---------- math grading: one grader per qid kind, (qid parts, parsed answer) -> result ----------
+def _grade_sub(parts, ans):
+    expected = float(parts[3])
+    # zero tolerance: a plain equality, with no subtraction or abs()
+    return {"correct": ans == expected, "expected": expected, "units": None,
+            "rationale": "Arithmetic subtraction"}
+
+def _grade_pct(parts, ans):
+    expected = float(parts[3])
+    tol = max(0.5, abs(expected) * 0.02)
+    return {"correct": abs(ans - expected) <= tol, "expected": expected, "units": None,
+            "rationale": "Percent-of calculation"}
+
+def _grade_div(parts, ans):
+    expected = float(parts[3])
+    tol = max(0.02 * abs(expected), 0.25)
+    return {"correct": abs(ans - expected) <= tol, "expected": expected, "units": None,
+            "rationale": "Division / rate calculation"}
+
+def _grade_vtarget(parts, ans):
+    # price/var/fixed/target are integers in the qid; the rationale shows them as-is
+    price, var, fixed, target = parts[1:5]
+    expected = float(parts[5])
+    return {"correct": abs(ans - expected) <= 0.5, "expected": expected, "units": "units",
+            "rationale": f"(Fixed+Target)/CM = ({fixed}+{target})/({price}-{var})"}
+
+def _grade_breakeven(parts, ans):
+    price, var, fixed = parts[1:4]
+    expected = float(parts[4])
+    return {"correct": abs(ans - expected) <= 0.5, "expected": expected, "units": "users",
+            "rationale": f"Breakeven units = Fixed / (Price - Var) = {fixed}/({price}-{var})"}
+
+def _grade_marginpct(parts, ans):
+    expected = float(parts[3])
+    tol = 0.5  # percentage points
+    # interpret e.g. 40, 40%, 0.40 → 40%
+    user_pct_pts = ans * (100 if abs(ans) <= 1.5 else 1)
+    return {"correct": abs(user_pct_pts - expected) <= tol,
+            "expected": expected, "units": "%", "rationale": "CM% = (P−V)/P × 100"}
+
+def _grade_pricemargin(parts, ans):
+    expected = float(parts[3])
+    tol = max(0.01 * expected, 0.5)
+    return {"correct": abs(ans - expected) <= tol, "expected": expected, "units": "$",
+            "rationale": "Solve P from margin% = (P−V)/P → P = V / (1 − m)"}
+
+def _grade_irr(parts, ans):
+    expected = float(parts[4])
+    tol = float(parts[5])
+    # interpret 26, 26%, 0.26 → 26%
+    user_pct_pts = ans * (100 if abs(ans) < 1.5 else 1)
+    return {"correct": abs(user_pct_pts - expected) <= tol,
+            "expected": round(expected, 2), "units": "%",
+            "rationale": "IRR ≈ (Final/Initial)^(1/Years) − 1, expressed as %"}
+
+_MM_GRADERS = {
+    "mm_gen_sub": _grade_sub,
+    "mm_gen_pct": _grade_pct,
+    "mm_gen_div": _grade_div,
+    "mm_cons_vtarget": _grade_vtarget,
+    "mm_cons_breakeven": _grade_breakeven,
+    "mm_cons_marginpct": _grade_marginpct,
+    "mm_cons_pricemargin": _grade_pricemargin,
+    "mm_ib_irr": _grade_irr,
+}
+
+@lru_cache(maxsize=4096)
+def _parse_qid(qid: str):
+    """(grader or None, qid parts); a qid is minted once and graded on every reply to it."""
+    parts = tuple(qid.split(":"))
+    return _MM_GRADERS.get(parts[0]), parts
 
 
 def grade_math_q(track: str, qid: str, answer_raw: str):
@@ -596,64 +750,7 @@ def grade_math_q(track: str, qid: str, answer_raw: str):
     except Exception:
         return {"error": "Could not parse numeric answer."}
 
-    parts = qid.split(":")
-    kind = parts[0]
-
-    def ok(delta_abs, tolerance):
-        return delta_abs <= tolerance
-
-    if kind == "mm_gen_sub":
-        expected = float(parts[3])
-        return {"correct": ok(abs(ans - expected), 0.0), "expected": expected, "units": None,
-                "rationale": "Arithmetic subtraction"}
-
-    if kind == "mm_gen_pct":
-        expected = float(parts[3])
-        tol = max(0.5, abs(expected) * 0.02)
-        return {"correct": ok(abs(ans - expected), tol), "expected": expected, "units": None,
-                "rationale": "Percent-of calculation"}
-
-    if kind == "mm_gen_div":
-        expected = float(parts[3])
-        tol = max(0.02 * abs(expected), 0.25)
-        return {"correct": ok(abs(ans - expected), tol), "expected": expected, "units": None,
-                "rationale": "Division / rate calculation"}
-
-    if kind == "mm_cons_vtarget":
-        price, var, fixed, target, units = map(float, parts[1:6])
-        expected = units
-        return {"correct": ok(abs(ans - expected), 0.5), "expected": expected, "units": "units",
-                "rationale": f"(Fixed+Target)/CM = ({int(fixed)}+{int(target)})/({int(price)}-{int(var)})"}
-
-    if kind == "mm_cons_breakeven":
-        price, var, fixed, units = map(float, parts[1:5])
-        expected = units
-        return {"correct": ok(abs(ans - expected), 0.5), "expected": expected, "units": "users",
-                "rationale": f"Breakeven units = Fixed / (Price - Var) = {int(fixed)}/({int(price)}-{int(var)})"}
-
-    if kind == "mm_cons_marginpct":
-        price, var, margin = float(parts[1]), float(parts[2]), float(parts[3])
-        expected = margin
-        tol = 0.5  # percentage points
-        # interpret e.g. 40, 40%, 0.40 → 40%
-        user_pct_pts = ans * (100 if abs(ans) <= 1.5 else 1)
-        return {"correct": ok(abs(user_pct_pts - expected), tol),
-                "expected": expected, "units": "%", "rationale": "CM% = (P−V)/P × 100"}
-
-    if kind == "mm_cons_pricemargin":
-        var, target_margin, price_needed = float(parts[1]), float(parts[2]), float(parts[3])
-        expected = price_needed
-        tol = max(0.01 * expected, 0.5)
-        return {"correct": ok(abs(ans - expected), tol), "expected": expected, "units": "$",
-                "rationale": "Solve P from margin% = (P−V)/P → P = V / (1 − m)"}
-
-    if kind == "mm_ib_irr":
-        expected = float(parts[4])
-        tol = float(parts[5])
-        # interpret 26, 26%, 0.26 → 26%
-        user_pct_pts = ans * (100 if abs(ans) < 1.5 else 1)
-        return {"correct": ok(abs(user_pct_pts - expected), tol),
-                "expected": round(expected, 2), "units": "%",
-                "rationale": "IRR ≈ (Final/Initial)^(1/Years) − 1, expressed as %"}
-
-    return {"error": "Unknown question id"}
+    grader, parts = _parse_qid(qid)
+    if grader is None:
+        return {"error": "Unknown question id"}
+    return grader(parts, ans)